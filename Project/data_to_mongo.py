@@ -1,13 +1,40 @@
 import os
+import re
 import sys
+import csv
+import functools
 import certifi
 import logging
 import json
+import time
+import queue
+import atexit
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+from bson import has_c as bson_has_c
 from dotenv import load_dotenv
-from pymongo import MongoClient, errors
-from logging.handlers import RotatingFileHandler
+from pymongo import IndexModel, MongoClient, errors
+from pymongo.write_concern import WriteConcern
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+# Optional fast path: pyarrow parses the CSV and pymongoarrow bulk-encodes
+# the Arrow table straight to BSON in C, skipping the DataFrame and the
+# list-of-dicts stages entirely.
+try:
+    import pyarrow.csv as pacsv
+    from pymongoarrow.api import write as pymongoarrow_write
+except ImportError:
+    pacsv = None
+    pymongoarrow_write = None
+
+# Optional: orjson serializes log records several times faster than the
+# stdlib encoder and emits bytes directly.
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # ================================================================
 # CONFIGURATIONS
@@ -29,6 +56,58 @@ os.makedirs(LOG_DIR, exist_ok=True)
 # Log file configuration
 LOG_FILE = os.path.join(LOG_DIR, f"data_migration_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
 
+# Rows per read/insert batch. 200 sits at the throughput knee for small
+# documents like these ~20-field rows; with 8 workers that keeps roughly
+# 1600 documents in flight. Override with MONGO_INSERT_BATCH if profiling
+# on a different deployment says otherwise — the override is clamped to
+# the server's maxWriteBatchSize (100k operations per write command), so
+# an oversized value cannot make insert_many split batches server-side.
+_MAX_WRITE_BATCH = 100_000
+BATCH_SIZE = min(int(os.getenv("MONGO_INSERT_BATCH", "200")), _MAX_WRITE_BATCH)
+
+# Concurrent insert_many workers (MongoDB scales with parallel bulk writes
+# until the primary saturates)
+MAX_WORKERS = 8
+
+# Ceiling on insert batches submitted but not yet acknowledged. Parsing is
+# faster than the network, so without a bound the reader would queue the
+# whole file's records in memory; two batches per worker keeps everyone
+# busy while capping the backlog.
+MAX_IN_FLIGHT = MAX_WORKERS * 2
+
+# --fast: use unacknowledged writes (w=0) for the bulk inserts. The batches
+# no longer block on server acknowledgement, at the cost of durability
+# guarantees — acceptable for this migration because the source CSVs can
+# simply be re-loaded if a run fails.
+FAST_WRITES = "--fast" in sys.argv
+
+# CSV file -> target collection mapping, materialized once as an indexable
+# tuple so menu selection does not rebuild a list per choice
+CSV_FILES = {
+    "covid-vaccinations-vs-covid-death-rate.csv": "covid_vacc_death_rate",
+    "covid-vaccine-doses-by-manufacturer.csv": "covid_vacc_manufacturer",
+    "united-states-rates-of-covid-19-deaths-by-vaccination-status.csv": "us_death_rates",
+}
+_FILES = tuple(CSV_FILES.items())
+
+# CA bundle path resolved once (certifi.where() reads from disk)
+_CA_FILE = certifi.where()
+
+# One client for the whole run: pooled connections sized for the insert
+# workers, wire compression for the wide float-heavy tables, and no
+# retryWrites bookkeeping round-trip (safe with ordered=False bulk inserts).
+# w=1 pins the acknowledged path to primary-only acknowledgement: a URI
+# defaulting to w="majority" would otherwise make every batch wait for
+# replica acknowledgement, which a rerunnable one-shot migration does not
+# need. (--fast drops further to w=0, see FAST_WRITES.)
+CLIENT_OPTIONS = {
+    "tlsCAFile": _CA_FILE,
+    "maxPoolSize": 64,
+    "compressors": "zstd,snappy,zlib",
+    "retryWrites": False,
+    "w": 1,
+}
+
 # Set up logger
 logger = logging.getLogger("DataMigrationLogger")
 logger.setLevel(logging.INFO)
@@ -39,128 +118,394 @@ class JSONFormatter(logging.Formatter):
             "timestamp": self.formatTime(record, self.datefmt),
             "level": record.levelname,
             "message": record.getMessage(),
-            "filename": record.pathname,
+            "filename": record.filename,  # short name; the full path wasted bytes on every line
             "line_no": record.lineno,
         }
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
+        if orjson is not None:
+            return orjson.dumps(log_record).decode()
         return json.dumps(log_record)
 
-# File handler for logs
-file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3)
-file_formatter = JSONFormatter()
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
+class ThrottledRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler whose rollover size check (a stat per emit) only
+    runs every 1024 records. With a 5 MiB limit the file can overshoot by
+    at most ~1024 log lines, which is an acceptable margin here.
+    """
+
+    CHECK_INTERVAL = 1024
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._emit_count = 0
+
+    def shouldRollover(self, record):
+        self._emit_count += 1
+        if self._emit_count % self.CHECK_INTERVAL:
+            return False
+        return super().shouldRollover(record)
+
+# Guard so a re-import (or a second importer) does not attach duplicate
+# handlers, open a second log file, or start a second listener thread.
+if not logger.handlers:
+    # File handler for logs
+    file_handler = ThrottledRotatingFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3)
+    file_formatter = JSONFormatter()
+    file_handler.setFormatter(file_formatter)
 
-# Stream handler for console output
-stream_handler = logging.StreamHandler(sys.stdout)
-stream_handler.setFormatter(file_formatter)
-logger.addHandler(stream_handler)
+    # Stream handler for console output
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(file_formatter)
 
-logger.info("Logger setup complete. Logs will be written to '%s'.", LOG_FILE)
+    # The migration thread only enqueues records; a background listener thread
+    # does the JSON formatting and the two synchronous writes.
+    _log_queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(_log_queue))
+    _log_listener = QueueListener(_log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+    logger.info("Logger setup complete. Logs will be written to '%s'.", LOG_FILE)
+
+    # Without the C extension every document is BSON-encoded in pure
+    # Python, which dominates bulk-insert CPU; flag it once at startup so
+    # a slow run is explainable.
+    if not bson_has_c():
+        logger.warning("bson C extension is not active; BSON encoding will run in pure Python and slow the migration.")
 
 # ================================================================
 # HELPER FUNCTIONS
 # ================================================================
 
-def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
+# Compiled once at import; clean_column_names runs per batch
+_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9_]+")
+_UNDERSCORE_RE = re.compile(r"_+")
+
+# Column names that look like dates: the tokens must appear as whole
+# underscore-separated words, and one compiled case-insensitive scan per
+# name replaces a .lower() allocation plus three substring searches
+_DATE_COL_RE = re.compile(r"(?:^|_)(?:date|day|time)(?:_|$)", re.IGNORECASE)
+
+def clean_column_name(name: str) -> str:
     """
-    Makes column names compatible with MongoDB:
+    Makes a single column name compatible with MongoDB:
     - Replaces spaces and special characters with underscores.
     - Converts double underscores to single underscores.
     - Removes leading and trailing underscores.
     """
-    df.columns = df.columns.str.replace(r"[^a-zA-Z0-9_]", "_", regex=True)
-    df.columns = df.columns.str.replace(r"__+", "_", regex=True)  # Double underscores are converted to single underscores
-    df.columns = df.columns.str.strip("_")  # Leading and trailing underscores are removed
+    return _UNDERSCORE_RE.sub("_", _NON_ALNUM_RE.sub("_", str(name))).strip("_")
+
+def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Makes column names compatible with MongoDB using the precompiled
+    patterns above, instead of recompiling regexes on every call.
+    """
+    df.columns = [clean_column_name(column) for column in df.columns]
     return df
 
-def validate_csv_file(file_path: str) -> bool:
+# Extensions whose delimiter is fixed by convention; sniffing those files
+# would just be an extra open+scan for a foregone conclusion.
+_KNOWN_DELIMITERS = {".csv": ",", ".tsv": "\t"}
+
+@functools.lru_cache(maxsize=32)
+def detect_delimiter(file_path: str) -> str:
+    """
+    Returns the delimiter for a file: by extension when it is
+    conventional (.csv/.tsv), otherwise sniffed with csv.Sniffer.
+    Falls back to a comma if detection fails. Results are cached per
+    path, so repeated loads of the same file skip the sniff entirely.
+    """
+    known = _KNOWN_DELIMITERS.get(os.path.splitext(file_path)[1].lower())
+    if known is not None:
+        return known
+    with open(file_path, "r", encoding="utf-8") as csvfile:
+        # 64 KiB gives the sniffer enough context to avoid misdetection on
+        # rows with long quoted fields, at negligible startup cost.
+        sample = csvfile.read(1 << 16)
+    try:
+        return csv.Sniffer().sniff(sample).delimiter
+    except csv.Error:
+        return ","
+
+def open_for_sequential_read(file_path: str):
+    """
+    Opens the CSV with a 1 MiB buffer and hints the kernel that the file
+    will be read sequentially, so read-ahead hides page-fault stalls
+    during parsing.
     """
-    Checks the existence and accessibility of the CSV file.
+    handle = open(file_path, "rb", buffering=1 << 20)
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(handle.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    return handle
+
+def validate_csv_file(file_path: str):
     """
-    if not os.path.exists(file_path):
+    Checks the existence and readability of the CSV file.
+
+    One stat call covers existence and size; os.access answers the
+    readability question (unlike inspecting the stat mode bits, it
+    accounts for supplementary groups and ACLs).
+
+    Returns the file size in bytes, or None if the file is unusable, so
+    the caller can log the expected volume up front.
+    """
+    try:
+        file_stat = os.stat(file_path)
+    except (FileNotFoundError, NotADirectoryError):
         logger.error(f"File not found: {file_path}")
-        return False
+        return None
+    except PermissionError:
+        logger.error(f"No read access to file: {file_path}")
+        return None
+
     if not os.access(file_path, os.R_OK):
         logger.error(f"No read access to file: {file_path}")
-        return False
-    return True
+        return None
+    return file_stat.st_size
 
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """
     Cleans the DataFrame:
     - Trims leading and trailing spaces from string cells.
-    - Replaces NaN values with None.
+    - Replaces NaN values with None in string columns.
+
+    Numeric NaN is left alone: the BSON encoder stores it as a double NaN,
+    so the former whole-frame .where(pd.notnull(df), None) pass (which
+    allocated an object-dtype copy of every column) is unnecessary. NaT in
+    datetime columns is mapped to None later, in df_to_records.
     """
-    for column in df.select_dtypes(include="object").columns:
-        df[column] = df[column].map(lambda x: str(x).strip() if isinstance(x, str) else x)
-    df = df.where(pd.notnull(df), None)
+    object_columns = df.select_dtypes(include=["object", "string"]).columns
+    if len(object_columns):
+        # One null scan for the whole subset; stripping cannot introduce new
+        # missing values, so the mask stays valid after str.strip.
+        na_mask = df[object_columns].isna()
+        # Series.str.strip runs in pandas' Cython string kernel, one pass per
+        # column, instead of a Python-level call per cell.
+        df[object_columns] = df[object_columns].apply(lambda s: s.str.strip())
+        df[object_columns] = df[object_columns].mask(na_mask, None)
     return df
 
-def load_csv_to_mongo(client, db_name, file_path, collection_name):
+def convert_datetime_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Reads and cleans a CSV file and transfers it to MongoDB.
+    Converts date-like columns (detected by name) to datetime.
+
+    Each column is parsed with a single vectorized pd.to_datetime call.
+    A cheap sample check picks the ISO8601 fast path when possible so
+    parsing stays in compiled code, and cache=True deduplicates repeated
+    date strings.
+
+    Only string-typed columns are considered: numeric columns can match
+    the name heuristic too (the deaths measure contains "7_day_average"),
+    and to_datetime would silently reinterpret their floats as epoch
+    nanoseconds.
     """
-    if not validate_csv_file(file_path):
-        return
+    string_columns = df.select_dtypes(include=["object", "string"]).columns
+    date_columns = [column for column in string_columns if _DATE_COL_RE.search(column)]
+    if not date_columns:
+        return df
 
-    try:
-        # Load the CSV file
-        df = pd.read_csv(file_path, delimiter=",", encoding="utf-8", engine="python")
-        logger.info(f"Loaded {len(df)} records from {file_path}.")
+    def _to_datetime(series):
+        sample = series.dropna().astype(str).head(50)
+        if sample.empty:
+            return series
+        fmt = "ISO8601" if sample.str.match(r"^\d{4}-\d{2}-\d{2}").all() else "mixed"
+        return pd.to_datetime(series, format=fmt, errors="coerce", cache=True)
+
+    # One assignment over the whole date-column subset instead of a
+    # per-column write that defragments the block manager each iteration
+    df[date_columns] = df[date_columns].apply(_to_datetime)
+    return df
+
+def df_to_records(df: pd.DataFrame) -> list:
+    """
+    Converts a DataFrame to a list of dicts, column by column.
+
+    Faster than DataFrame.to_dict(orient="records"): each column is exported
+    once through the C-level tolist() instead of one Python __getitem__ call
+    per cell. Datetime columns are converted to Python datetimes so they are
+    stored as ISODate in MongoDB.
+    """
+    columns = list(df.columns)
+    datetime_columns = [c for c in columns if is_datetime64_any_dtype(df[c])]
+    na_mask = df[datetime_columns].isna() if datetime_columns else None
+    arrays = []
+    for column in columns:
+        series = df[column]
+        if column in datetime_columns:
+            series = series.astype(object).mask(na_mask[column], None)
+        arrays.append(series.tolist())
+    return [dict(zip(columns, row)) for row in zip(*arrays)]
 
-        # Clean column names
-        df = clean_column_names(df)
+def drop_secondary_indexes(collection):
+    """
+    Drops non-_id indexes before a bulk load — each index costs an extra
+    write per inserted document — and returns their specs so the caller
+    can rebuild them once after the load.
+    """
+    index_specs = [spec for spec in collection.list_indexes() if spec["name"] != "_id_"]
+    for spec in index_specs:
+        collection.drop_index(spec["name"])
+    if index_specs:
+        logger.info(f"Dropped {len(index_specs)} secondary index(es) on '{collection.name}' for the bulk load.")
+    return index_specs
 
-        # Data cleaning
-        df = clean_dataframe(df)
+def restore_indexes(collection, index_specs):
+    """Rebuilds the indexes removed by drop_secondary_indexes in one command."""
+    if not index_specs:
+        return
+    collection.create_indexes(
+        [IndexModel(list(spec["key"].items()), name=spec["name"]) for spec in index_specs]
+    )
+    logger.info(f"Rebuilt {len(index_specs)} index(es) on '{collection.name}'.")
+
+def load_csv_to_mongo(client, db_name, file_path, collection_name, executor=None):
+    """
+    Reads and cleans a CSV file and transfers it to MongoDB.
 
-        # Data verification before transferring to MongoDB
-        logger.info(f"DataFrame columns: {list(df.columns)}")
-        logger.info(f"Sample data:\n{df.head()}")
+    When an executor is given, insert_many calls are submitted to it so
+    Mongo network round-trips overlap with CSV parsing.
+    """
+    file_size = validate_csv_file(file_path)
+    if file_size is None:
+        return
+    logger.info(f"Loading '{file_path}' ({file_size} bytes).")
 
-        # Convert DataFrame to dictionary format and transfer to MongoDB
-        data_records = df.to_dict(orient="records")
+    try:
+        delimiter = detect_delimiter(file_path)
         db = client[db_name]
-        collection = db[collection_name]
-        collection.insert_many(data_records)
-        logger.info(f"{len(data_records)} records successfully inserted into '{collection_name}'.")
+        if FAST_WRITES:
+            collection = db.get_collection(collection_name, write_concern=WriteConcern(w=0))
+        else:
+            collection = db[collection_name]
 
+        # Insert into an index-free collection and rebuild afterwards: one
+        # bulk index build is much cheaper than per-document index writes.
+        # The restore sits in a finally block so a failed insert cannot
+        # leave the collection without its secondary indexes.
+        index_specs = drop_secondary_indexes(collection)
+        try:
+            return _insert_csv(collection, collection_name, file_path, delimiter, executor)
+        finally:
+            restore_indexes(collection, index_specs)
     except Exception as e:
         logger.error(f"Error during data migration: {e}")
 
+
+def _insert_csv(collection, collection_name, file_path, delimiter, executor):
+    """
+    Inserts one CSV file into an (index-free) collection; split out of
+    load_csv_to_mongo so the index restore can wrap it in try/finally.
+    """
+    total_inserted = 0
+    futures = set()
+    last_progress_log = time.monotonic()
+
+    # Arrow fast path: CSV tokenization and BSON encoding both stay in
+    # compiled code when pyarrow + pymongoarrow are installed.
+    if pacsv is not None and pymongoarrow_write is not None:
+        table = pacsv.read_csv(
+            file_path,
+            # Split the file into 8 MiB blocks parsed on all cores with
+            # pyarrow's SIMD tokenizer
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=8 << 20),
+            parse_options=pacsv.ParseOptions(delimiter=delimiter),
+            convert_options=pacsv.ConvertOptions(timestamp_parsers=["%Y-%m-%d", pacsv.ISO8601]),
+        )
+        table = table.rename_columns([clean_column_name(name) for name in table.column_names])
+        pymongoarrow_write(collection, table)
+        logger.info(f"{table.num_rows} records successfully inserted into '{collection_name}' (Arrow path).")
+        return
+
+    # Stream the CSV in batches instead of loading it fully into memory:
+    # resident memory stays at O(BATCH_SIZE) rows and network writes start
+    # before the tail of the file has been parsed. The chunked reader
+    # requires the C engine (pyarrow does not support chunksize).
+    with open_for_sequential_read(file_path) as csv_handle, \
+            pd.read_csv(csv_handle, sep=delimiter, encoding="utf-8",
+                        engine="c", chunksize=BATCH_SIZE) as reader:
+        for batch_no, chunk in enumerate(reader, start=1):
+            # Clean column names
+            chunk = clean_column_names(chunk)
+
+            # Parse date columns so they land in MongoDB as ISODate
+            chunk = convert_datetime_columns(chunk)
+
+            # Data cleaning
+            chunk = clean_dataframe(chunk)
+
+            # Convert the batch to dictionary format and transfer to MongoDB
+            data_records = df_to_records(chunk)
+            if executor is not None:
+                futures.add(executor.submit(collection.insert_many, data_records, ordered=False))
+                # Apply backpressure once the in-flight cap is reached:
+                # block until a batch finishes and surface its errors.
+                if len(futures) >= MAX_IN_FLIGHT:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            else:
+                collection.insert_many(data_records, ordered=False)
+            total_inserted += len(data_records)
+
+            # Progress as a throttled counter rather than one line per
+            # batch (tens of thousands of lines on the big files)
+            now = time.monotonic()
+            if now - last_progress_log >= 1.0:
+                logger.info(f"{total_inserted} records inserted into '{collection_name}' so far ({batch_no} batches).")
+                last_progress_log = now
+
+    # Surface any insert errors from the worker threads
+    for future in as_completed(futures):
+        future.result()
+
+    logger.info(f"{total_inserted} records successfully inserted into '{collection_name}'.")
+
+    # The client-side total is authoritative for acknowledged writes, so
+    # the server count round-trip only runs after an unacknowledged
+    # (--fast) load, where it is the only confirmation we get.
+    if FAST_WRITES:
+        logger.info(f"Collection '{collection_name}' now holds ~{collection.estimated_document_count()} documents.")
+
 # ================================================================
 # MAIN FUNCTION
 # ================================================================
 
 def main():
     base_path = "/Users/dr.sam/Desktop/CodeGenesis-TEAM/data/raw"  # Base directory
-    csv_files = {
-        "covid-vaccinations-vs-covid-death-rate.csv": "covid_vacc_death_rate",
-        "covid-vaccine-doses-by-manufacturer.csv": "covid_vacc_manufacturer",
-        "united-states-rates-of-covid-19-deaths-by-vaccination-status.csv": "us_death_rates",
-    }
 
-    print("Select an option:")
-    print("0. Load all data")
-    for i, (file_name, collection_name) in enumerate(csv_files.items(), start=1):
-        print(f"{i}. {file_name} -> {collection_name}")
+    # One buffered write for the whole menu instead of a print per line
+    menu_lines = ["Select an option:", "0. Load all data"]
+    menu_lines += [f"{i}. {file_name} -> {collection_name}"
+                   for i, (file_name, collection_name) in enumerate(_FILES, start=1)]
+    sys.stdout.write("\n".join(menu_lines) + "\n")
 
     try:
         choice = int(input("Your choice: "))
         if choice == 0:
             logger.info("Selected option: Load all data.")
-            with MongoClient(MONGO_URI, tlsCAFile=certifi.where()) as client:
-                for file_name, collection_name in csv_files.items():
-                    file_path = os.path.join(base_path, file_name)
-                    load_csv_to_mongo(client, DATABASE_NAME, file_path, collection_name)
+            # The files are independent, so parse/insert them concurrently.
+            # File tasks get their own small pool: running them on the
+            # shared insert pool could deadlock, with every worker stuck
+            # in a file task waiting for batch inserts that have no worker
+            # left to run on. The MongoClient is thread-safe and shared.
+            with MongoClient(MONGO_URI, **CLIENT_OPTIONS) as client, \
+                    ThreadPoolExecutor(max_workers=MAX_WORKERS) as insert_pool, \
+                    ThreadPoolExecutor(max_workers=len(_FILES)) as file_pool:
+                file_futures = [
+                    file_pool.submit(load_csv_to_mongo, client, DATABASE_NAME,
+                                     os.path.join(base_path, file_name), collection_name, insert_pool)
+                    for file_name, collection_name in _FILES
+                ]
+                for future in as_completed(file_futures):
+                    future.result()
             logger.info("All data loaded successfully.")
-        elif 1 <= choice <= len(csv_files):
-            file_name, collection_name = list(csv_files.items())[choice - 1]
+        elif 1 <= choice <= len(_FILES):
+            file_name, collection_name = _FILES[choice - 1]
             file_path = os.path.join(base_path, file_name)
-            with MongoClient(MONGO_URI, tlsCAFile=certifi.where()) as client:
-                load_csv_to_mongo(client, DATABASE_NAME, file_path, collection_name)
+            with MongoClient(MONGO_URI, **CLIENT_OPTIONS) as client, \
+                    ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                load_csv_to_mongo(client, DATABASE_NAME, file_path, collection_name, executor)
         else:
             print("Invalid selection.")
     except ValueError:
@@ -0,0 +1,34 @@
+"""Unit tests for the CSV -> MongoDB migration helpers."""
+
+import os
+
+import pandas as pd
+
+# data_to_mongo refuses to import without its connection settings; the
+# helpers under test never touch the network.
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", "codegenesis_test")
+
+from data_to_mongo import convert_datetime_columns
+
+# Real header from united-states-rates-of-covid-19-deaths-by-vaccination-status.csv;
+# the "7_day" fragment matches the date-column name heuristic.
+DEATHS_COLUMN = (
+    "Daily_new_confirmed_deaths_due_to_COVID_19_per_million_people_"
+    "rolling_7_day_average_right_aligned"
+)
+
+
+def test_string_day_column_is_parsed():
+    df = pd.DataFrame({"Day": ["2021-01-01", "2021-01-02"]})
+    result = convert_datetime_columns(df)
+    assert pd.api.types.is_datetime64_any_dtype(result["Day"])
+
+
+def test_numeric_day_average_column_is_left_alone():
+    # Floats must not be reinterpreted as epoch nanoseconds just because
+    # the column name contains a date-like token.
+    df = pd.DataFrame({DEATHS_COLUMN: [0.514, 1.2, 3.4]})
+    result = convert_datetime_columns(df)
+    assert result[DEATHS_COLUMN].dtype == "float64"
+    assert result[DEATHS_COLUMN].tolist() == [0.514, 1.2, 3.4]